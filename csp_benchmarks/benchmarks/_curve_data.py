@@ -0,0 +1,44 @@
+"""
+Curve input shared by the benchmark suites.
+
+csp.curve takes history either as a list of (datetime, value) pairs or, in
+newer csp releases, as a (times, values) tuple of numpy arrays, which skips
+per-tick Python object handling. The benchmarks run against a matrix of csp
+versions, so the numpy form is only used where the installed csp accepts it.
+"""
+
+from datetime import datetime
+from functools import cache
+
+import csp
+import numpy as np
+
+
+@cache
+def _numpy_curve_supported(typ: type, ndim: int) -> bool:
+    """Check that csp.curve ticks a (times, values) numpy tuple, one value per timestamp."""
+    start = datetime(2020, 1, 1)
+    times = np.datetime64(start, "s") + np.arange(2, dtype="timedelta64[s]")
+    values = np.arange(6.0).reshape(2, 3) if ndim > 1 else np.arange(2.0)
+
+    def g():
+        csp.add_graph_output("output", csp.curve(typ, (times, values)))
+
+    try:
+        ticks = csp.run(g, starttime=start, endtime=times[-1].item(), realtime=False)["output"]
+    except Exception:
+        return False
+    return len(ticks) == 2 and all(np.array_equal(tick, row) for (_, tick), row in zip(ticks, values))
+
+
+def curve_data(typ: type, times: np.ndarray, values: np.ndarray) -> tuple | list:
+    """
+    Build csp.curve data for values ticking at times.
+
+    Returns the (times, values) numpy tuple when the installed csp supports
+    it, otherwise a list of (datetime, value) pairs; 2D values tick one row per
+    timestamp either way.
+    """
+    if _numpy_curve_supported(typ, values.ndim):
+        return times, values
+    return list(zip(times.astype("datetime64[us]").tolist(), list(values) if values.ndim > 1 else values.tolist()))
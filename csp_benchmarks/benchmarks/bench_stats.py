@@ -7,6 +7,13 @@ from datetime import datetime, timedelta
 import csp
 import numpy as np
 
+from ._curve_data import curve_data
+
+
+def _make_test_times(start_date: datetime, num_rows: int) -> np.ndarray:
+    """Build one datetime64[s] timestamp per second starting at start_date."""
+    return np.datetime64(start_date, "s") + np.arange(num_rows, dtype="timedelta64[s]")
+
 
 class StatsBenchmarkSuite:
     """
@@ -16,19 +23,25 @@ class StatsBenchmarkSuite:
     operating on time series of numpy arrays.
     """
 
+    __slots__ = ("data", "interval")
+
     params = (["median", "quantile", "rank"], [100, 500, 1000])
     param_names = ["function", "interval"]
 
     # Additional args for specific functions
     function_args = {"quantile": {"quant": 0.95}}
 
+    # Timestamps do not depend on params, so build them once for the class
+    start_date = datetime(2020, 1, 1)
+    num_rows = 1_000
+    array_size = 100
+    test_times = _make_test_times(start_date, num_rows)
+
     def setup(self, function, interval):
-        self.start_date = datetime(2020, 1, 1)
-        self.num_rows = 1_000
-        self.array_size = 100
-        self.test_times = [self.start_date + timedelta(seconds=i) for i in range(self.num_rows)]
-        self.random_values = [np.random.normal(size=(self.array_size,)) for i in range(self.num_rows)]
-        self.data = list(zip(self.test_times, self.random_values))
+        # One RNG call into a contiguous block; csp.curve ticks one row per timestamp.
+        # Fixed seed keeps runs reproducible across machines.
+        rng = np.random.default_rng(0)
+        self.data = curve_data(np.ndarray, self.test_times, rng.standard_normal((self.num_rows, self.array_size)))
         self.interval = interval
 
     def time_stats(self, function, interval):
@@ -47,15 +60,18 @@ class StatsScalingSuite:
     Benchmarks for testing how stats functions scale with data size.
     """
 
+    __slots__ = ("data",)
+
     params = [10, 50, 100, 500]
     param_names = ["array_size"]
 
+    start_date = datetime(2020, 1, 1)
+    num_rows = 500
+    test_times = _make_test_times(start_date, num_rows)
+
     def setup(self, array_size):
-        self.start_date = datetime(2020, 1, 1)
-        self.num_rows = 500
-        self.test_times = [self.start_date + timedelta(seconds=i) for i in range(self.num_rows)]
-        self.random_values = [np.random.normal(size=(array_size,)) for i in range(self.num_rows)]
-        self.data = list(zip(self.test_times, self.random_values))
+        rng = np.random.default_rng(0)
+        self.data = curve_data(np.ndarray, self.test_times, rng.standard_normal((self.num_rows, array_size)))
 
     def time_mean_scaling(self, array_size):
         """Test how mean computation scales with array size."""
@@ -10,15 +10,21 @@ Usage:
     csp-benchmarks run                     # Run all benchmarks
     csp-benchmarks run --suite core        # Run specific suite
     csp-benchmarks run --quick             # Quick mode (fewer params)
+    csp-benchmarks run --no-warmup         # Skip the untimed warmup run
+    csp-benchmarks run --json              # Emit results as JSON on stdout
 """
 
 from __future__ import annotations
 
 import argparse
+import gc
 import importlib
-import inspect
+import io
 import sys
 import time
+from collections.abc import Iterator
+from functools import cache
+from itertools import product
 from typing import Any
 
 # Benchmark modules to discover
@@ -30,29 +36,34 @@ BENCHMARK_MODULES = [
 ]
 
 
-def discover_benchmarks() -> dict[str, dict[str, Any]]:
-    """
-    Discover all benchmark classes and their time_* methods.
+def _safe_import(module_name: str) -> Any:
+    """Import a benchmark module, returning None (with a warning) if it fails."""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        print(f"Warning: Could not import {module_name}: {e}", file=sys.stderr)
+        return None
 
-    Returns:
-        Dictionary mapping suite names to their benchmark info.
-    """
+
+@cache
+def _discover_benchmarks() -> dict[str, dict[str, Any]]:
+    """Import the benchmark modules and collect their suites; cached, see discover_benchmarks."""
     benchmarks = {}
 
+    # Imported one at a time: the modules all import csp, and importing it from
+    # several threads at once risks importlib deadlocks or half-initialised modules
     for module_name in BENCHMARK_MODULES:
-        try:
-            module = importlib.import_module(module_name)
-        except ImportError as e:
-            print(f"Warning: Could not import {module_name}: {e}", file=sys.stderr)
+        module = _safe_import(module_name)
+        if module is None:
             continue
 
-        # Find all benchmark classes (those with time_* methods)
-        for name, obj in inspect.getmembers(module, inspect.isclass):
-            if not name.endswith("Suite"):
+        # Find all benchmark classes (those with time_* methods) defined in this module
+        for name, obj in vars(module).items():
+            if not (isinstance(obj, type) and obj.__module__ == module.__name__ and name.endswith("Suite")):
                 continue
 
             # Get all time_* methods
-            time_methods = [m for m in dir(obj) if m.startswith("time_") and callable(getattr(obj, m))]
+            time_methods = [m for m, attr in vars(obj).items() if m.startswith("time_") and callable(attr)]
 
             if time_methods:
                 # Extract suite name from module
@@ -70,6 +81,20 @@ def discover_benchmarks() -> dict[str, dict[str, Any]]:
     return benchmarks
 
 
+def discover_benchmarks() -> dict[str, dict[str, Any]]:
+    """
+    Discover all benchmark classes and their time_* methods.
+
+    Discovery runs once and is cached (``_discover_benchmarks.cache_clear()``
+    forces it to run again); each call returns a fresh copy, so callers
+    cannot corrupt the cached result.
+
+    Returns:
+        Dictionary mapping suite names to their benchmark info.
+    """
+    return {name: {**info, "methods": list(info["methods"])} for name, info in _discover_benchmarks().items()}
+
+
 def list_benchmarks() -> int:
     """List all available benchmarks."""
     benchmarks = discover_benchmarks()
@@ -83,7 +108,7 @@ def list_benchmarks() -> int:
     for suite_name, info in sorted(benchmarks.items()):
         print(f"  {suite_name}")
         if info["params"]:
-            param_desc = ", ".join(f"{name}={vals}" for name, vals in zip(info["param_names"] or [], _normalize_params(info["params"])))
+            param_desc = ", ".join(f"{name}={list(vals)}" for name, vals in zip(info["param_names"] or [], _normalize_params(info["params"])))
             print(f"    Parameters: {param_desc}")
         for method in info["methods"]:
             print(f"    - {method}")
@@ -92,68 +117,96 @@ def list_benchmarks() -> int:
     return 0
 
 
-def _normalize_params(params: Any) -> list[list]:
-    """Normalize params to list of lists."""
+@cache
+def _normalize_params_cached(params_key: tuple) -> tuple[tuple, ...]:
+    """Normalize a hashable params key to a tuple of tuples."""
+    if not params_key:
+        return ()
+    if isinstance(params_key[0], tuple):
+        return tuple(tuple(p) for p in params_key)
+    return (params_key,)
+
+
+def _normalize_params(params: Any) -> tuple[tuple, ...]:
+    """Normalize params to a tuple of tuples, cached per distinct params value."""
     if not params:
-        return []
-    if isinstance(params[0], (list, tuple)):
-        return [list(p) for p in params]
-    return [params]
+        return ()
+    key = tuple(tuple(p) if isinstance(p, (list, tuple)) else p for p in params)
+    try:
+        return _normalize_params_cached(key)
+    except TypeError:
+        # Unhashable param values (e.g. dicts) cannot be cached
+        return _normalize_params_cached.__wrapped__(key)
 
 
-def _get_param_combinations(params: Any, param_names: list[str] | None, quick: bool = False) -> list[dict]:
-    """Get all parameter combinations to run."""
+def _get_param_combinations(params: Any, param_names: list[str] | None, quick: bool = False) -> Iterator[dict]:
+    """Lazily yield all parameter combinations to run."""
     if not params:
-        return [{}]
+        yield {}
+        return
 
     normalized = _normalize_params(params)
     names = param_names or [f"param{i}" for i in range(len(normalized))]
 
-    # In quick mode, only use first and last value of each param
+    # In quick mode, run only the all-first and all-last corners instead of the 2^m product
     if quick:
-        normalized = [[p[0], p[-1]] if len(p) > 1 else p for p in normalized]
+        yield dict(zip(names, (p[0] for p in normalized)))
+        if any(len(p) > 1 for p in normalized):
+            yield dict(zip(names, (p[-1] for p in normalized)))
+        return
 
     # Generate all combinations
-    from itertools import product
-
-    combinations = []
     for combo in product(*normalized):
-        combinations.append(dict(zip(names, combo)))
-
-    return combinations
+        yield dict(zip(names, combo))
 
 
-def run_benchmark_method(instance: Any, method_name: str, params: dict, num_runs: int = 3) -> dict:
+def run_benchmark_method(instance: Any, method_name: str, params: dict, num_runs: int = 3, warmup: bool = True) -> dict:
     """
     Run a single benchmark method and return timing results.
 
+    The untimed warmup call can be skipped when the benchmark's graphs are
+    already wired at import/setup time and the first call has no extra cost.
+
     Returns:
         Dictionary with timing statistics.
     """
+    # Resolve the bound method, args and clock once, outside the timed loop
     method = getattr(instance, method_name)
     param_values = tuple(params.values()) if params else ()
+    perf_counter_ns = time.perf_counter_ns
 
-    # Warmup run
+    # Any exception aborts the benchmark, so a single handler covers warmup and timed runs
+    times = []
+    gc_enabled = gc.isenabled()
     try:
-        method(*param_values)
-    except Exception as e:
-        return {"error": str(e)}
+        # Warmup run
+        if warmup:
+            method(*param_values)
 
-    # Timed runs
-    times = []
-    for _ in range(num_runs):
-        start = time.perf_counter()
-        try:
+        # Timed runs, in integer nanoseconds. Collect between runs and keep
+        # the garbage collector from pausing inside a timed call.
+        for _ in range(num_runs):
+            gc.collect()
+            gc.disable()
+            start = perf_counter_ns()
             method(*param_values)
-        except Exception as e:
-            return {"error": str(e)}
-        elapsed = time.perf_counter() - start
-        times.append(elapsed)
+            times.append(perf_counter_ns() - start)
+            if gc_enabled:
+                gc.enable()
+    except Exception as e:
+        return {"error": str(e)}
+    finally:
+        if gc_enabled:
+            gc.enable()
 
+    min_ns, max_ns, mean_ns = min(times), max(times), sum(times) // len(times)
     return {
-        "min": min(times),
-        "max": max(times),
-        "mean": sum(times) / len(times),
+        "min": min_ns / 1e9,
+        "max": max_ns / 1e9,
+        "mean": mean_ns / 1e9,
+        "min_ns": min_ns,
+        "max_ns": max_ns,
+        "mean_ns": mean_ns,
         "runs": num_runs,
     }
 
@@ -170,51 +223,70 @@ def format_time(seconds: float) -> str:
         return f"{seconds:.3f} s"
 
 
+def format_ns(ns: int) -> str:
+    """Format an integer nanosecond duration in human-readable units."""
+    if ns < 1_000:
+        return f"{ns} ns"
+    return format_time(ns / 1e9)
+
+
 def run_benchmarks(
     suite_filter: str | None = None,
     method_filter: str | None = None,
     quick: bool = False,
     num_runs: int = 3,
     verbose: bool = False,
+    warmup: bool = True,
+    json_output: bool = False,
 ) -> int:
-    """Run benchmarks and print results."""
+    """Run benchmarks and print results.
+
+    With ``json_output`` the per-benchmark lines are not formatted at all; a single
+    JSON list of results (timings in integer nanoseconds) is written to stdout at the
+    end and the human-readable progress goes to stderr instead.
+    """
+    out = sys.stderr if json_output else sys.stdout
+    results: list[dict[str, Any]] = []
+
     benchmarks = discover_benchmarks()
 
     if not benchmarks:
-        print("No benchmarks found.")
+        print("No benchmarks found.", file=out)
         return 1
 
     # Filter suites
     if suite_filter:
         benchmarks = {k: v for k, v in benchmarks.items() if suite_filter.lower() in k.lower()}
         if not benchmarks:
-            print(f"No benchmarks matching '{suite_filter}' found.")
+            print(f"No benchmarks matching '{suite_filter}' found.", file=out)
             return 1
 
-    print(f"Running CSP benchmarks (quick={quick}, runs={num_runs})")
-    print("=" * 70)
+    print(f"Running CSP benchmarks (quick={quick}, runs={num_runs})", file=out)
+    print("=" * 70, file=out)
 
     try:
         import csp
 
-        print(f"CSP version: {getattr(csp, '__version__', 'unknown')}")
+        print(f"CSP version: {getattr(csp, '__version__', 'unknown')}", file=out)
     except ImportError:
-        print("ERROR: csp is not installed. Install it with: pip install csp")
+        print("ERROR: csp is not installed. Install it with: pip install csp", file=out)
         return 1
 
-    print()
+    print(file=out)
 
     total_passed = 0
     total_failed = 0
+    total_skipped = 0
 
-    for suite_name, info in sorted(benchmarks.items()):
-        print(f"\n{suite_name}")
-        print("-" * len(suite_name))
+    # Per-benchmark lines are buffered and written once per suite, so stdout
+    # I/O does not interleave with the timed runs
+    buf = io.StringIO()
 
-        # Get parameter combinations
-        param_combos = _get_param_combinations(info["params"], info["param_names"], quick)
+    for suite_name, info in sorted(benchmarks.items()):
+        print(f"\n{suite_name}", file=out)
+        print("-" * len(suite_name), file=out, flush=True)
 
-        for params in param_combos:
+        for params in _get_param_combinations(info["params"], info["param_names"], quick):
             # Create instance and run setup
             instance = info["class"]()
 
@@ -222,8 +294,19 @@ def run_benchmarks(
                 try:
                     param_values = tuple(params.values()) if params else ()
                     instance.setup(*param_values)
+                except NotImplementedError as e:
+                    # Same convention as ASV: setup raising NotImplementedError skips the benchmark
+                    if json_output:
+                        results.append({"suite": suite_name, "method": None, "params": params, "skipped": str(e)})
+                    else:
+                        buf.write(f"  - Skipped for params {params}: {e}\n")
+                    total_skipped += 1
+                    continue
                 except Exception as e:
-                    print(f"  Setup failed for params {params}: {e}")
+                    if json_output:
+                        results.append({"suite": suite_name, "method": None, "params": params, "error": f"setup failed: {e}"})
+                    else:
+                        buf.write(f"  Setup failed for params {params}: {e}\n")
                     total_failed += 1
                     continue
 
@@ -235,26 +318,48 @@ def run_benchmarks(
                 methods = [m for m in methods if method_filter.lower() in m.lower()]
 
             for method_name in methods:
-                result = run_benchmark_method(instance, method_name, params, num_runs)
+                result = run_benchmark_method(instance, method_name, params, num_runs, warmup)
+
+                if json_output:
+                    entry = {"suite": suite_name, "method": method_name, "params": params}
+                    if "error" in result:
+                        entry["error"] = result["error"]
+                        total_failed += 1
+                    else:
+                        entry.update(min_ns=result["min_ns"], mean_ns=result["mean_ns"], max_ns=result["max_ns"])
+                        total_passed += 1
+                    results.append(entry)
+                    continue
 
                 display_name = method_name.replace("time_", "")
                 if param_str:
                     display_name = f"{display_name}({param_str})"
 
                 if "error" in result:
-                    print(f"  ✗ {display_name}: ERROR - {result['error']}")
+                    buf.write(f"  ✗ {display_name}: ERROR - {result['error']}\n")
                     total_failed += 1
                 else:
-                    time_str = format_time(result["mean"])
+                    time_str = format_ns(result["mean_ns"])
                     if verbose:
-                        print(f"  ✓ {display_name}: {time_str} (min={format_time(result['min'])}, max={format_time(result['max'])})")
+                        buf.write(f"  ✓ {display_name}: {time_str} (min={format_ns(result['min_ns'])}, max={format_ns(result['max_ns'])})\n")
                     else:
-                        print(f"  ✓ {display_name}: {time_str}")
+                        buf.write(f"  ✓ {display_name}: {time_str}\n")
                     total_passed += 1
 
-    print()
-    print("=" * 70)
-    print(f"Results: {total_passed} passed, {total_failed} failed")
+        sys.stdout.write(buf.getvalue())
+        sys.stdout.flush()
+        buf.seek(0)
+        buf.truncate(0)
+
+    print(file=out)
+    print("=" * 70, file=out)
+    print(f"Results: {total_passed} passed, {total_failed} failed, {total_skipped} skipped", file=out)
+
+    if json_output:
+        import json
+
+        # default=str keeps non-JSON param values (e.g. numpy scalars) from aborting the dump
+        print(json.dumps(results, separators=(",", ":"), default=str))
 
     return 0 if total_failed == 0 else 1
 
@@ -301,6 +406,18 @@ def main() -> int:
         action="store_true",
         help="Show detailed timing info (min/max)",
     )
+    run_parser.add_argument(
+        "--no-warmup",
+        dest="warmup",
+        action="store_false",
+        help="Skip the untimed warmup run before each benchmark",
+    )
+    run_parser.add_argument(
+        "--json",
+        dest="json_output",
+        action="store_true",
+        help="Print results as a JSON list on stdout (timings in nanoseconds)",
+    )
 
     args = parser.parse_args()
 
@@ -313,6 +430,8 @@ def main() -> int:
             quick=args.quick,
             num_runs=args.runs,
             verbose=args.verbose,
+            warmup=args.warmup,
+            json_output=args.json_output,
         )
 
     return 0
@@ -4,17 +4,23 @@ CLI tool for running benchmarks on Hetzner Cloud.
 
 Usage:
     python -m csp_benchmarks.hetzner.cli run --token $HCLOUD_TOKEN
+    python -m csp_benchmarks.hetzner.cli run --branch main --branch my-feature
     python -m csp_benchmarks.hetzner.cli cleanup --token $HCLOUD_TOKEN
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
 import logging
 import os
+import re
 import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
-from .runner import BenchmarkConfig, HetznerBenchmarkRunner
+from .runner import BenchmarkConfig, HetznerBenchmarkRunner, provision_fingerprint
 from .server import HetznerServerManager, ServerConfig
 
 logging.basicConfig(
@@ -24,68 +30,157 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def run_benchmarks(args: argparse.Namespace) -> int:
-    """Run benchmarks on a Hetzner Cloud server."""
-    token = args.token or os.environ.get("HCLOUD_TOKEN")
-    if not token:
-        logger.error("Hetzner Cloud token required. Set HCLOUD_TOKEN or use --token")
-        return 1
+# Hetzner server names must be valid hostnames, so at most one 63 character label
+_MAX_SERVER_NAME_LENGTH = 63
 
-    # Configure server
-    server_config = ServerConfig(
-        name=args.server_name,
-        server_type=args.server_type,
-        ssh_key_name=args.ssh_key_name,
-    )
 
-    # Configure benchmarks
-    benchmark_config = BenchmarkConfig(
-        python_version=args.python_version,
-    )
+def _with_branch_hash(name: str, branch: str) -> str:
+    """Append a short hash of the branch to a server name, truncating it to fit."""
+    suffix = hashlib.sha256(branch.encode()).hexdigest()[:6]
+    return f"{name[: _MAX_SERVER_NAME_LENGTH - len(suffix) - 1].rstrip('-')}-{suffix}"
 
-    manager = HetznerServerManager(token=token, config=server_config)
+
+def _server_name(base_name: str, branch: str, num_branches: int) -> str:
+    """Server name for a branch; a single-branch run keeps the configured name."""
+    if num_branches == 1:
+        return base_name
+    name = f"{base_name}-{re.sub(r'[^a-z0-9-]+', '-', branch.lower()).strip('-')}"
+    return name if len(name) <= _MAX_SERVER_NAME_LENGTH else _with_branch_hash(name, branch)
+
+
+def _server_names(base_name: str, branches: list[str]) -> dict[str, str]:
+    """Server name for each branch, with a hash suffix where branches would share one (e.g. feature/a and feature-a)."""
+    names = {branch: _server_name(base_name, branch, len(branches)) for branch in branches}
+    counts = Counter(names.values())
+    return {branch: _with_branch_hash(name, branch) if counts[name] > 1 else name for branch, name in names.items()}
+
+
+def _run_branch(
+    args: argparse.Namespace,
+    manager: HetznerServerManager,
+    benchmark_config: BenchmarkConfig,
+    branch: str,
+    server_name: str,
+    fingerprint: str | None,
+    push_lock: threading.Lock,
+    bake_lock: threading.Lock,
+) -> int:
+    """Run the benchmarks for one branch on its own server."""
     server = None
+    image_id = None
+    # Only a server this call created from the base image may be baked: a --reuse
+    # server's setup is unknown, and one booted from a snapshot is already baked
+    bake_candidate = False
+    bake = False
 
     try:
         # Check if server already exists
-        server = manager.get_server()
+        server = manager.get_server(server_name)
         if server and not args.reuse:
             logger.info(f"Server {server.name} already exists. Use --reuse to reuse it.")
             return 1
         elif not server:
-            server = manager.create_server()
+            image_id = manager.find_baked_image(fingerprint) if fingerprint else None
+            if image_id:
+                logger.info(f"Booting from baked image {image_id}")
+            server = manager.create_server(name=server_name, image_id=image_id)
+            bake_candidate = fingerprint is not None and image_id is None
 
         # Run benchmarks
-        runner = HetznerBenchmarkRunner(
+        with HetznerBenchmarkRunner(
             server=server,
             config=benchmark_config,
             ssh_key_path=args.ssh_key,
-            branch=args.branch,
-        )
-
-        results = runner.run_benchmarks()
-        logger.info(f"Benchmarks completed. Results: {len(results.get('results_files', []))} files")
-
-        # Push results if requested
-        if args.push:
-            github_token = args.github_token or os.environ.get("GITHUB_TOKEN")
-            runner.push_results_to_repo(github_token=github_token)
+            branch=branch,
+            provisioned=image_id is not None,
+        ) as runner:
+            results_archive = None
+            if args.results_dir:
+                os.makedirs(args.results_dir, exist_ok=True)
+                results_archive = os.path.join(args.results_dir, f"{server_name}-results.tar.gz")
+            results = runner.run_benchmarks(results_archive=results_archive)
+            logger.info(f"Benchmarks for {branch} completed. Results: {results.get('results_count', 0)} files")
+
+            # Push results if requested, one branch at a time: each push fetches the
+            # latest main inside the lock and fast-forwards it, so pushes never race
+            if args.push:
+                github_token = args.github_token or os.environ.get("GITHUB_TOKEN")
+                with push_lock:
+                    runner.push_results_to_repo(github_token=github_token)
+
+            # Bake the freshly set up server so the next run can skip provisioning;
+            # with several branches only the first to get here bakes
+            bake = bake_candidate and bake_lock.acquire(blocking=False)
+            if bake:
+                try:
+                    runner.clean_for_snapshot()
+                except Exception as clean_error:
+                    logger.warning(f"Not baking image, cleanup failed: {clean_error}")
+                    bake = False
+
+        if bake:
+            try:
+                manager.bake_image(server, fingerprint)
+            except Exception as bake_error:
+                logger.warning(f"Failed to bake image: {bake_error}")
 
         return 0
 
     except Exception as e:
-        logger.exception(f"Benchmark run failed: {e}")
+        logger.exception(f"Benchmark run for {branch} failed: {e}")
         return 1
 
     finally:
         if not args.keep_server and server is not None:
-            logger.info("Cleaning up server...")
+            logger.info(f"Cleaning up server {server.name}...")
             try:
                 manager.delete_server(server)
             except Exception as cleanup_error:
                 logger.error(f"Failed to cleanup server: {cleanup_error}")
 
 
+def run_benchmarks(args: argparse.Namespace) -> int:
+    """Run benchmarks on Hetzner Cloud, one server per branch."""
+    token = args.token or os.environ.get("HCLOUD_TOKEN")
+    if not token:
+        logger.error("Hetzner Cloud token required. Set HCLOUD_TOKEN or use --token")
+        return 1
+
+    # Configure server
+    server_config = ServerConfig(
+        name=args.server_name,
+        server_type=args.server_type,
+        ssh_key_name=args.ssh_key_name,
+    )
+
+    # Configure benchmarks
+    benchmark_config = BenchmarkConfig(
+        python_version=args.python_version,
+    )
+
+    manager = HetznerServerManager(token=token, config=server_config)
+    fingerprint = manager.image_fingerprint(provision_fingerprint(benchmark_config)) if args.image_cache else None
+
+    branches = list(dict.fromkeys(args.branch or ["main"]))
+    push_lock = threading.Lock()
+    bake_lock = threading.Lock()
+
+    server_names = _server_names(args.server_name, branches)
+
+    def run(branch: str) -> int:
+        return _run_branch(args, manager, benchmark_config, branch, server_names[branch], fingerprint, push_lock, bake_lock)
+
+    if len(branches) == 1:
+        return run(branches[0])
+
+    # Branches are independent, so each gets its own server; wall time is the
+    # slowest branch instead of the sum, bounded by --max-parallel-servers
+    with ThreadPoolExecutor(max_workers=max(1, min(len(branches), args.max_parallel_servers))) as executor:
+        return_codes = list(executor.map(run, branches))
+
+    return 0 if all(code == 0 for code in return_codes) else 1
+
+
 def cleanup_servers(args: argparse.Namespace) -> int:
     """Clean up any leftover benchmark servers."""
     token = args.token or os.environ.get("HCLOUD_TOKEN")
@@ -96,16 +191,13 @@ def cleanup_servers(args: argparse.Namespace) -> int:
     manager = HetznerServerManager(token=token)
 
     # Find and delete all csp-benchmark servers
-    servers = manager.client.servers.get_all()
-    deleted = 0
+    servers = manager.list_benchmark_servers()
 
-    for server in servers:
-        if server.name.startswith("csp-benchmark"):
-            logger.info(f"Deleting server: {server.name}")
-            manager.delete_server(server)
-            deleted += 1
+    # Each delete is a blocking API call, so issue them concurrently
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(manager.delete_server, servers))
 
-    logger.info(f"Cleaned up {deleted} servers")
+    logger.info(f"Cleaned up {len(servers)} servers")
     return 0
 
 
@@ -124,12 +216,28 @@ def main() -> int:
     run_parser.add_argument("--server-type", default="cx23", help="Hetzner server type (cx23, cx43)")
     run_parser.add_argument("--ssh-key", help="Path to SSH private key")
     run_parser.add_argument("--ssh-key-name", help="Name of SSH key in Hetzner")
-    run_parser.add_argument("--branch", default="main", help="Branch to checkout before running benchmarks")
+    run_parser.add_argument(
+        "--branch",
+        action="append",
+        help="Branch to checkout before running benchmarks (default: main); repeat to benchmark several branches in parallel",
+    )
+    run_parser.add_argument(
+        "--max-parallel-servers",
+        type=int,
+        default=4,
+        help="Maximum number of servers to run at once when benchmarking several branches (default: 4)",
+    )
     run_parser.add_argument("--python-version", default="3.11", help="Python version to use for benchmarks")
     run_parser.add_argument("--reuse", action="store_true", help="Reuse existing server")
     run_parser.add_argument("--keep-server", action="store_true", help="Keep server after benchmarks")
     run_parser.add_argument("--push", action="store_true", help="Push results to repository")
+    run_parser.add_argument("--results-dir", help="Local directory to save each server's results to as a .tar.gz (default: don't download)")
     run_parser.add_argument("--github-token", help="GitHub token for pushing results")
+    run_parser.add_argument(
+        "--image-cache",
+        action="store_true",
+        help="Boot from a baked snapshot matching the setup, or bake one after the run if none exists",
+    )
     run_parser.set_defaults(func=run_benchmarks)
 
     # Cleanup command
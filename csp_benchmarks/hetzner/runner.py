@@ -4,20 +4,34 @@ Benchmark runner for Hetzner Cloud servers.
 
 from __future__ import annotations
 
+import hashlib
 import logging
+import os
+import posixpath
+import re
+import shutil
 import subprocess
+import tarfile
 import tempfile
+import weakref
 from dataclasses import dataclass
-from pathlib import Path
 from typing import TYPE_CHECKING
 
+from .server import wait_for_port
+
 if TYPE_CHECKING:
     from hcloud.servers import BoundServer
 
 logger = logging.getLogger(__name__)
 
+# Set to any non-empty value to open a fresh SSH connection per command
+DISABLE_SSH_MUX_ENV = "CSP_BENCHMARKS_DISABLE_SSH_MUX"
+
+# Token in an authenticated push URL, which git echoes back in its error output
+_ACCESS_TOKEN_RE = re.compile(r"(x-access-token:)[^@\s]+@")
+
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class BenchmarkConfig:
     """Configuration for benchmark runs."""
 
@@ -26,6 +40,29 @@ class BenchmarkConfig:
     python_version: str = "3.11"
 
 
+def _provision_steps(config: BenchmarkConfig) -> list[tuple[str, str]]:
+    """Branch-independent setup steps, which are what a baked server image captures."""
+    # uv and its standalone Python only need curl from the base image, so they
+    # download in the background while cloud-init installs git and the build
+    # packages and the repository is cloned.
+    uv_setup = f"curl -LsSf https://astral.sh/uv/install.sh | sh && $HOME/.local/bin/uv python install {config.python_version}"
+    return [
+        ("install uv and python in background", f"( {uv_setup} ) > /root/uv-setup.log 2>&1 & UV_SETUP_PID=$!"),
+        ("wait for cloud-init", "cloud-init status --wait || true"),
+        # Recent history of every branch, with blobs fetched on demand for the checkout;
+        # --no-single-branch keeps other branches checkable despite --depth
+        ("clone benchmark repository", f"git clone --filter=blob:none --depth=50 --no-single-branch {config.benchmark_repo} /root/csp-benchmarks"),
+        ("wait for uv and python install", "wait $UV_SETUP_PID || { cat /root/uv-setup.log >&2; exit 1; }"),
+        ("create venv", f"cd /root/csp-benchmarks && $HOME/.local/bin/uv venv .venv --python {config.python_version}"),
+    ]
+
+
+def provision_fingerprint(config: BenchmarkConfig) -> str:
+    """Hash of the provisioning steps for ``config``, used to match baked images."""
+    commands = "\n".join(command for _, command in _provision_steps(config))
+    return hashlib.sha256(commands.encode()).hexdigest()
+
+
 class HetznerBenchmarkRunner:
     """
     Runs ASV benchmarks on a Hetzner Cloud server.
@@ -35,6 +72,10 @@ class HetznerBenchmarkRunner:
     2. Setting up the benchmark environment
     3. Running ASV benchmarks
     4. Collecting and returning results
+
+    All ssh calls share one multiplexed OpenSSH connection (ControlMaster),
+    so only the first command pays for the TCP and key-exchange handshake.
+    Use the runner as a context manager, or call ``close()``, to tear it down.
     """
 
     def __init__(
@@ -43,6 +84,7 @@ class HetznerBenchmarkRunner:
         config: BenchmarkConfig | None = None,
         ssh_key_path: str | None = None,
         branch: str = "main",
+        provisioned: bool = False,
     ):
         """
         Initialize the benchmark runner.
@@ -52,17 +94,67 @@ class HetznerBenchmarkRunner:
             config: Benchmark configuration
             ssh_key_path: Path to SSH private key for authentication
             branch: Branch to checkout before running benchmarks
+            provisioned: Whether the server was booted from a baked image
+                (see ``HetznerServerManager.bake_image``), so only per-run setup is needed
         """
         self.server = server
         self.config = config or BenchmarkConfig()
         self.ssh_key_path = ssh_key_path
         self.branch = branch
+        self.provisioned = provisioned
         self.server_ip = server.public_net.ipv4.ip
 
-    def run_benchmarks(self) -> dict:
+        # Options shared by every ssh invocation, built once
+        self._mux_dir = None if os.environ.get(DISABLE_SSH_MUX_ENV) else tempfile.mkdtemp(prefix="csp-bench-ssh-")
+        # Removes the socket directory even if the runner is never closed
+        self._remove_mux_dir = weakref.finalize(self, shutil.rmtree, self._mux_dir, ignore_errors=True) if self._mux_dir else None
+        self._ssh_base_args = [
+            "-o",
+            "StrictHostKeyChecking=no",
+            "-o",
+            "UserKnownHostsFile=/dev/null",
+        ]
+        if self._mux_dir:
+            self._ssh_base_args.extend(
+                [
+                    "-o",
+                    "ControlMaster=auto",
+                    "-o",
+                    f"ControlPath={self._mux_dir}/cm-%r@%h:%p",
+                    "-o",
+                    "ControlPersist=10m",
+                ]
+            )
+        if self.ssh_key_path:
+            self._ssh_base_args.extend(["-i", self.ssh_key_path])
+
+    def __enter__(self) -> HetznerBenchmarkRunner:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the shared SSH connection and remove its control socket directory."""
+        if self._mux_dir is None:
+            return
+
+        subprocess.run(
+            ["ssh", *self._ssh_base_args, "-O", "exit", f"root@{self.server_ip}"],
+            capture_output=True,
+            check=False,
+        )
+        self._remove_mux_dir()
+        self._mux_dir = None
+
+    def run_benchmarks(self, results_archive: str | None = None) -> dict:
         """
         Run the full benchmark suite on the remote server.
 
+        Args:
+            results_archive: Local path, owned by the caller, to save the results
+                directory to as a .tar.gz; results are not downloaded when omitted
+
         Returns:
             Dictionary containing benchmark results and metadata
         """
@@ -75,25 +167,14 @@ class HetznerBenchmarkRunner:
         results = self._run_asv()
 
         # Collect results
-        return self._collect_results(results)
+        return self._collect_results(results, results_archive)
 
-    def _run_ssh_command(self, command: str, check: bool = True) -> subprocess.CompletedProcess:
-        """Run a command on the remote server via SSH."""
-        ssh_args = [
-            "ssh",
-            "-o",
-            "StrictHostKeyChecking=no",
-            "-o",
-            "UserKnownHostsFile=/dev/null",
-        ]
-
-        if self.ssh_key_path:
-            ssh_args.extend(["-i", self.ssh_key_path])
-
-        ssh_args.extend([f"root@{self.server_ip}", command])
+    def _run_ssh_command(self, command: str, check: bool = True, input: str | None = None) -> subprocess.CompletedProcess:
+        """Run a command on the remote server via SSH, optionally feeding ``input`` to its stdin."""
+        ssh_args = ["ssh", *self._ssh_base_args, f"root@{self.server_ip}", command]
 
         logger.debug(f"Running SSH command: {command}")
-        result = subprocess.run(ssh_args, capture_output=True, text=True, check=check)
+        result = subprocess.run(ssh_args, capture_output=True, text=True, check=check, input=input)
 
         if result.stdout:
             logger.debug(f"stdout: {result.stdout}")
@@ -102,42 +183,58 @@ class HetznerBenchmarkRunner:
 
         return result
 
-    def _scp_to_server(self, local_path: str, remote_path: str) -> None:
-        """Copy a file to the remote server."""
-        scp_args = [
-            "scp",
-            "-o",
-            "StrictHostKeyChecking=no",
-            "-o",
-            "UserKnownHostsFile=/dev/null",
-        ]
+    def _tar_from_server(self, remote_path: str, archive_path: str) -> None:
+        """
+        Save a remote directory to ``archive_path`` as a .tar.gz streamed over SSH.
 
-        if self.ssh_key_path:
-            scp_args.extend(["-i", self.ssh_key_path])
+        Unlike ``scp -r`` this does not open a transfer per file, which matters for
+        ASV's many small result files, and the stream is written to disk as-is.
+        """
+        remote_path = remote_path.rstrip("/")
+        remote_parent, remote_leaf = posixpath.split(remote_path)
 
-        scp_args.extend([local_path, f"root@{self.server_ip}:{remote_path}"])
+        ssh_args = ["ssh", *self._ssh_base_args, f"root@{self.server_ip}", f"tar -C {remote_parent} -czf - {remote_leaf}"]
+        logger.debug(f"Streaming {remote_path} from server")
 
-        subprocess.run(scp_args, check=True)
+        with open(archive_path, "wb") as archive:
+            subprocess.run(ssh_args, stdout=archive, check=True)
 
-    def _scp_from_server(self, remote_path: str, local_path: str) -> None:
-        """Copy a file from the remote server."""
-        scp_args = [
-            "scp",
-            "-r",
-            "-o",
-            "StrictHostKeyChecking=no",
-            "-o",
-            "UserKnownHostsFile=/dev/null",
-        ]
+    def _run_ssh_script(self, steps: list[tuple[str, str]]) -> subprocess.CompletedProcess:
+        """
+        Run a sequence of shell steps on the remote server in a single SSH session.
 
-        if self.ssh_key_path:
-            scp_args.extend(["-i", self.ssh_key_path])
+        The steps are sent as one script over stdin to ``bash -s`` and stop at the
+        first failure. Each step echoes a ``### step N`` marker, which is used to
+        log progress and to report which step failed.
 
-        scp_args.extend([f"root@{self.server_ip}:{remote_path}", local_path])
+        Args:
+            steps: (description, command) pairs, run in order
 
-        subprocess.run(scp_args, check=True)
+        Returns:
+            The completed SSH process
+        """
+        # No -u: sourcing venv activate scripts is not safe with unset-variable checks
+        lines = ["set -exo pipefail"]
+        for i, (description, command) in enumerate(steps, 1):
+            lines.append(f"echo '### step {i}: {description}'")
+            lines.append(command)
+        script = "\n".join(lines) + "\n"
+
+        result = self._run_ssh_command("bash -s", check=False, input=script)
+
+        completed = [line for line in result.stdout.splitlines() if line.startswith("### step ")]
+        for marker in completed:
+            logger.info(marker[4:])
+
+        if result.returncode != 0:
+            failed = completed[-1][4:] if completed else "before step 1"
+            stdout, stderr = (_ACCESS_TOKEN_RE.sub(r"\1***@", output) for output in (result.stdout, result.stderr))
+            logger.error(f"Remote script failed at {failed} (exit code {result.returncode}):\n{stderr[-2000:]}")
+            raise subprocess.CalledProcessError(result.returncode, "bash -s", stdout, stderr)
 
-    def _wait_for_ssh(self, timeout: int = 300, interval: int = 15) -> None:
+        return result
+
+    def _wait_for_ssh(self, timeout: int = 300, interval: float = 1.0) -> None:
         """Wait for SSH to become available on the server."""
         import time
 
@@ -145,8 +242,15 @@ class HetznerBenchmarkRunner:
         start_time = time.time()
         last_error = None
 
+        # Probe the port with plain TCP connects first, which are far cheaper than
+        # spawning ssh, then confirm with a real login since sshd may accept
+        # connections before cloud-init has installed the authorized keys
+        wait_for_port(self.server_ip, 22, timeout=timeout, interval=interval)
+
         while time.time() - start_time < timeout:
             try:
+                # With multiplexing enabled, the first successful call becomes the
+                # control master that every later ssh call reuses
                 result = self._run_ssh_command("echo 'SSH ready'", check=False)
                 if result.returncode == 0:
                     logger.info("SSH connection established")
@@ -172,29 +276,32 @@ class HetznerBenchmarkRunner:
         server_type = self.server.server_type.name
         machine_name = f"hetzner-{server_type}"
 
-        commands = [
-            # Wait for cloud-init to complete
-            "cloud-init status --wait || true",
-            # Install uv
-            "curl -LsSf https://astral.sh/uv/install.sh | sh",
-            # Add uv to PATH for this session
-            "export PATH=$HOME/.local/bin:$PATH",
-            # Install Python versions with uv
-            f"$HOME/.local/bin/uv python install {self.config.python_version}",
-            # Clone the benchmark repository
-            f"git clone {self.config.benchmark_repo} /root/csp-benchmarks",
-            # Checkout the specified branch
-            f"cd /root/csp-benchmarks && git checkout {self.branch}",
-            # Set up Python environment using uv and Makefile
-            f"cd /root/csp-benchmarks && $HOME/.local/bin/uv venv .venv --python {self.config.python_version}",
-            "cd /root/csp-benchmarks && PATH=$HOME/.local/bin:$PATH make develop",
+        # All steps run in one SSH session, so the PATH export and background job carry over
+        steps = [("add uv to PATH", "export PATH=$HOME/.local/bin:$PATH")]
+        if self.provisioned:
+            # The image holds the checkout from when it was baked; bring it up to date
+            checkout = (
+                f"cd /root/csp-benchmarks && git fetch --quiet origin && git checkout -f {self.branch}"
+                f" && git clean -fdq -- csp_benchmarks/results && {{ git reset --hard --quiet origin/{self.branch} 2>/dev/null || true; }}"
+            )
+        else:
+            steps.extend(_provision_steps(self.config))
+            checkout = f"cd /root/csp-benchmarks && git checkout {self.branch}"
+
+        steps += [
+            ("checkout branch", checkout),
+            # Install the pinned dependencies from uv.lock; refs with no uv.lock, or one that no
+            # longer matches pyproject.toml, fall back to the unpinned make develop install
+            (
+                "install develop dependencies",
+                "cd /root/csp-benchmarks && if [ -f uv.lock ] && uv sync --locked --extra develop; then :; else make develop; fi",
+            ),
             # Initialize ASV machine config
-            "cp /root/csp-benchmarks/csp_benchmarks/asv-machine.json ~/.asv-machine.json",
-            "cd /root/csp-benchmarks && . .venv/bin/activate && make benchmark-init",
+            ("copy ASV machine config", "cp /root/csp-benchmarks/csp_benchmarks/asv-machine.json ~/.asv-machine.json"),
+            ("initialize ASV", "cd /root/csp-benchmarks && . .venv/bin/activate && make benchmark-init"),
         ]
 
-        for cmd in commands:
-            self._run_ssh_command(cmd)
+        self._run_ssh_script(steps)
 
         # Store machine name for use in _run_asv
         self._machine_name = machine_name
@@ -226,8 +333,24 @@ class HetznerBenchmarkRunner:
 
         return asv_output
 
-    def _collect_results(self, asv_output: str) -> dict:
-        """Collect benchmark results from the remote server."""
+    def clean_for_snapshot(self) -> None:
+        """
+        Remove a run's leftovers so the server can be baked into a reusable image.
+
+        Drops the (possibly pushed) result files, the ASV environments and HTML,
+        the scratch results index and the bot's git identity, keeping the clone,
+        uv and the synced virtualenv that make a baked image worth booting from.
+        """
+        logger.info("Cleaning run artifacts before snapshot...")
+        steps = [
+            ("remove ASV environments and HTML", "cd /root/csp-benchmarks && rm -rf .asv .git/benchmark-results-index"),
+            ("reset results", "git checkout -f -- csp_benchmarks/results && git clean -fdxq -- csp_benchmarks/results"),
+            ("remove git identity", "git config --unset user.email || true; git config --unset user.name || true"),
+        ]
+        self._run_ssh_script(steps)
+
+    def _collect_results(self, asv_output: str, archive_path: str | None = None) -> dict:
+        """Collect benchmark results from the remote server, saving them to ``archive_path`` if given."""
         logger.info("Collecting benchmark results...")
 
         # Results are relative to the ASV config file location (csp_benchmarks/asv.conf.json)
@@ -247,78 +370,88 @@ class HetznerBenchmarkRunner:
                     "ip": self.server_ip,
                 },
                 "asv_output": asv_output,
-                "results_files": [],
+                "results_archive": None,
+                "results_count": 0,
                 "error": "No results directory found",
             }
 
-        # Create a temporary directory to store results
-        with tempfile.TemporaryDirectory() as tmpdir:
-            local_results = Path(tmpdir) / "results"
-            local_results.mkdir()
-
-            # Copy results from server (results_dir is relative to config file location)
-            self._scp_from_server(results_path, str(local_results))
-
-            # Read and parse results
-            results = {
-                "server": {
-                    "name": self.server.name,
-                    "id": self.server.id,
-                    "type": self.server.server_type.name,
-                    "ip": self.server_ip,
-                },
-                "asv_output": asv_output,
-                "results_files": [],
-            }
-
-            for result_file in local_results.rglob("*.json"):
-                results["results_files"].append(
-                    {
-                        "name": result_file.name,
-                        "content": result_file.read_text(),
-                    }
-                )
-
-            return results
+        if archive_path is None:
+            # Nothing to keep locally (results are pushed from the server), so only count them
+            count_result = self._run_ssh_command(f"find {results_path} -type f -name '*.json' | wc -l")
+            results_count = int(count_result.stdout.strip() or 0)
+            logger.info(f"Found {results_count} result files on the server")
+        else:
+            # Keep the results on disk as a single archive at the caller's path,
+            # rather than reading every file into memory
+            self._tar_from_server(results_path, archive_path)
+
+            with tarfile.open(archive_path, "r:gz") as archive:
+                results_count = sum(1 for member in archive if member.isfile() and member.name.endswith(".json"))
+
+            logger.info(f"Saved {results_count} result files to {archive_path}")
+        return {
+            "server": {
+                "name": self.server.name,
+                "id": self.server.id,
+                "type": self.server.server_type.name,
+                "ip": self.server_ip,
+            },
+            "asv_output": asv_output,
+            "results_archive": archive_path,
+            "results_count": results_count,
+        }
 
     def push_results_to_repo(self, github_token: str | None = None) -> None:
         """
         Push benchmark results back to the repository.
 
+        The results commit is built on a freshly fetched ``main`` rather than on the
+        benchmarked checkout, so benchmarking a feature branch never pushes that
+        branch's history to ``main``, and each push is a fast-forward of the latest main.
+
         Args:
             github_token: Optional GitHub token for authentication
         """
         logger.info("Pushing results to repository...")
 
-        # List files in results directory before committing (for debugging)
-        list_result = self._run_ssh_command(
-            "find /root/csp-benchmarks/csp_benchmarks/results -name '*.json' | head -50",
-            check=False,
-        )
-        logger.debug(f"Result files on server:\n{list_result.stdout}")
-
-        commands = [
-            "cd /root/csp-benchmarks && git config user.email 'benchmark-bot@example.com'",
-            "cd /root/csp-benchmarks && git config user.name 'Benchmark Bot'",
-            # Transform results to use real CSP tag commit hashes (for proper x-axis display)
-            "cd /root/csp-benchmarks && . .venv/bin/activate && make benchmark-transform",
-            # Use -A to ensure all new/modified files are staged
-            "cd /root/csp-benchmarks && git add -A csp_benchmarks/results/",
-            "cd /root/csp-benchmarks && git status --short csp_benchmarks/results/",
-            "cd /root/csp-benchmarks && git commit -m 'Add benchmark results' || true",
-        ]
-
         if github_token:
             # Use token for authentication
             push_url = self.config.benchmark_repo.replace("https://", f"https://x-access-token:{github_token}@")
-            commands.append(f"cd /root/csp-benchmarks && git push {push_url} HEAD:main")
         else:
-            commands.append("cd /root/csp-benchmarks && git push origin main")
+            push_url = "origin"
 
-        for cmd in commands:
-            result = self._run_ssh_command(cmd, check=False)
-            # Log git status output
-            if "git status" in cmd:
-                logger.info(f"Git status:\n{result.stdout}")
+        # One SSH session for the whole commit-and-push sequence; the script's
+        # working directory carries over between steps
+        steps = [
+            ("list result files", "cd /root/csp-benchmarks && { find csp_benchmarks/results -name '*.json' | head -50 || true; }"),
+            ("configure git identity", "git config user.email 'benchmark-bot@example.com' && git config user.name 'Benchmark Bot'"),
+            # Transform results to use real CSP tag commit hashes (for proper x-axis display)
+            ("transform results", ". .venv/bin/activate && make benchmark-transform"),
+            # Turn off xtrace around commands carrying the push URL so a token is not echoed
+            ("fetch main", f"{{ set +x; }} 2>/dev/null; git fetch {push_url} main; set -x"),
+            # Stage the results on top of the fetched main in a scratch index, leaving the checkout
+            # alone; --ignore-removal keeps results on main that this checkout does not have
+            (
+                "stage results on main",
+                (
+                    "export GIT_INDEX_FILE=.git/benchmark-results-index && git read-tree FETCH_HEAD"
+                    " && git add --ignore-removal csp_benchmarks/results/ && git diff --cached --stat FETCH_HEAD"
+                    " && RESULTS_TREE=$(git write-tree) && unset GIT_INDEX_FILE"
+                ),
+            ),
+            (
+                "commit results",
+                (
+                    'RESULTS_COMMIT= && if [ "$RESULTS_TREE" != "$(git rev-parse FETCH_HEAD^{tree})" ];'
+                    " then RESULTS_COMMIT=$(git commit-tree \"$RESULTS_TREE\" -p FETCH_HEAD -m 'Add benchmark results'); fi"
+                ),
+            ),
+            (
+                "push results",
+                f'{{ set +x; }} 2>/dev/null; if [ -n "$RESULTS_COMMIT" ]; then git push {push_url} "$RESULTS_COMMIT:refs/heads/main"; else echo "No new results"; fi',
+            ),
+        ]
 
+        result = self._run_ssh_script(steps)
+        logger.info(f"Push output:\n{result.stdout}")
         logger.info("Results pushed successfully")
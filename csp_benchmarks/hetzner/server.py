@@ -4,18 +4,30 @@ Hetzner Cloud server management for benchmarks.
 
 from __future__ import annotations
 
+import hashlib
 import logging
+import socket
 import time
 from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from hcloud.actions import BoundAction
     from hcloud.servers import BoundServer
 
 logger = logging.getLogger(__name__)
 
+# Label on baked snapshots, holding the fingerprint of the setup they contain
+IMAGE_FINGERPRINT_LABEL = "csp-benchmark-fingerprint"
 
-@dataclass
+# Label on every benchmark server, so they can be listed with a server-side filter
+SERVER_LABEL_SELECTOR = "purpose=csp-benchmark"
+
+# Servers created before labelling was introduced carry no purpose label at all
+UNLABELLED_SERVER_SELECTOR = "!purpose"
+
+
+@dataclass(frozen=True, slots=True)
 class ServerConfig:
     """Configuration for a Hetzner benchmark server."""
 
@@ -26,6 +38,30 @@ class ServerConfig:
     ssh_key_name: str | None = None
 
 
+def wait_for_port(host: str, port: int = 22, timeout: float = 300, interval: float = 1.0) -> None:
+    """
+    Wait until a TCP connection to ``host:port`` succeeds.
+
+    Args:
+        host: Host name or IP address
+        port: TCP port to probe
+        timeout: Seconds to wait before giving up
+        interval: Seconds to sleep between attempts
+
+    Raises:
+        TimeoutError: If the port does not accept connections within ``timeout``
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=2).close()
+            return
+        except OSError as e:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"{host}:{port} not reachable after {timeout} seconds: {e}") from e
+            time.sleep(interval)
+
+
 class HetznerServerManager:
     """
     Manages Hetzner Cloud servers for running benchmarks.
@@ -54,12 +90,15 @@ class HetznerServerManager:
         )
         self.config = config or ServerConfig()
 
-    def create_server(self, wait_for_ready: bool = True) -> BoundServer:
+    def create_server(self, wait_for_ready: bool = True, image_id: int | None = None, name: str | None = None) -> BoundServer:
         """
         Create a new Hetzner server for benchmarking.
 
         Args:
             wait_for_ready: Whether to wait for the server to be ready
+            image_id: Baked snapshot to boot from instead of the configured base
+                image; such servers skip cloud-init since it is already applied
+            name: Server name (defaults to config name)
 
         Returns:
             The created server object
@@ -68,7 +107,8 @@ class HetznerServerManager:
         from hcloud.locations import Location
         from hcloud.server_types import ServerType
 
-        logger.info(f"Creating Hetzner server: {self.config.name}")
+        name = name or self.config.name
+        logger.info(f"Creating Hetzner server: {name}")
 
         # Get SSH keys if specified
         ssh_keys = []
@@ -79,12 +119,13 @@ class HetznerServerManager:
 
         # Create the server
         response = self.client.servers.create(
-            name=self.config.name,
+            name=name,
             server_type=ServerType(name=self.config.server_type),
-            image=Image(name=self.config.image),
+            image=Image(id=image_id) if image_id else Image(name=self.config.image),
             location=Location(name=self.config.location),
             ssh_keys=ssh_keys if ssh_keys else None,
-            user_data=self._get_cloud_init_script(),
+            user_data=None if image_id else self._get_cloud_init_script(),
+            labels={"purpose": "csp-benchmark", "config": self.config.name},
         )
 
         server = response.server
@@ -92,7 +133,7 @@ class HetznerServerManager:
         logger.info(f"Server created: {server.name} (ID: {server.id})")
 
         if wait_for_ready:
-            self._wait_for_server_ready(server)
+            server = self._wait_for_server_ready(server, [response.action, *response.next_actions])
 
         return server
 
@@ -107,6 +148,71 @@ class HetznerServerManager:
         server.delete()
         logger.info("Server deleted successfully")
 
+    def image_fingerprint(self, setup_fingerprint: str) -> str:
+        """
+        Key a baked image by the cloud-init script and the runner's provisioning steps.
+
+        Args:
+            setup_fingerprint: Fingerprint of the runner setup (see ``runner.provision_fingerprint``)
+
+        Returns:
+            A hex digest short enough to be used as a label value
+        """
+        digest = hashlib.sha256((self._get_cloud_init_script() + setup_fingerprint).encode())
+        return digest.hexdigest()[:32]
+
+    def find_baked_image(self, fingerprint: str) -> int | None:
+        """
+        Look up a baked snapshot for a setup fingerprint.
+
+        Args:
+            fingerprint: Image fingerprint from ``image_fingerprint``
+
+        Returns:
+            The image ID if a matching snapshot is available, None otherwise
+        """
+        images = self.client.images.get_all(
+            type=["snapshot"],
+            status=["available"],
+            label_selector=f"{IMAGE_FINGERPRINT_LABEL}={fingerprint}",
+        )
+        return images[0].id if images else None
+
+    def bake_image(self, server: BoundServer, fingerprint: str) -> int:
+        """
+        Snapshot a fully set up server so later runs can boot from it.
+
+        Args:
+            server: A server whose benchmark environment has been set up
+            fingerprint: Image fingerprint from ``image_fingerprint``
+
+        Returns:
+            The ID of the new snapshot
+        """
+        logger.info(f"Baking snapshot of {server.name} (fingerprint: {fingerprint})")
+        response = server.create_image(
+            description=f"csp-benchmark-base-{fingerprint}",
+            type="snapshot",
+            labels={IMAGE_FINGERPRINT_LABEL: fingerprint},
+        )
+        # The server stays locked until the snapshot is done, so it cannot be deleted before then
+        response.action.wait_until_finished()
+        logger.info(f"Snapshot created (ID: {response.image.id})")
+        return response.image.id
+
+    def list_benchmark_servers(self) -> list[BoundServer]:
+        """
+        List all benchmark servers in the project.
+
+        Returns:
+            Servers labelled as benchmark servers, plus unlabelled servers
+            named like one (created before servers were labelled)
+        """
+        servers = self.client.servers.get_all(label_selector=SERVER_LABEL_SELECTOR)
+        servers += self.client.servers.get_all(label_selector=UNLABELLED_SERVER_SELECTOR)
+        # The name check is also a safety net against deleting anything else that happens to carry the label
+        return [server for server in servers if server.name.startswith("csp-benchmark")]
+
     def get_server(self, name: str | None = None) -> BoundServer | None:
         """
         Get an existing server by name.
@@ -120,31 +226,27 @@ class HetznerServerManager:
         name = name or self.config.name
         return self.client.servers.get_by_name(name)
 
-    def _wait_for_server_ready(self, server: BoundServer, timeout: int = 300) -> None:
-        """Wait for the server to be running and SSH-accessible."""
+    def _wait_for_server_ready(self, server: BoundServer, actions: list[BoundAction], timeout: int = 300) -> BoundServer:
+        """Wait for the server's create actions to finish and for SSH to accept connections."""
         logger.info("Waiting for server to be ready...")
 
         start_time = time.time()
-        while time.time() - start_time < timeout:
-            # Refresh server status
-            server = self.client.servers.get_by_id(server.id)
+        for action in actions:
+            # Raises ActionFailedException / ActionTimeoutException from hcloud
+            action.wait_until_finished()
 
-            if server.status == "running":
-                logger.info(f"Server is running at {server.public_net.ipv4.ip}")
-                # Give SSH a bit more time to be ready
-                time.sleep(30)
-                return
+        # One refresh once the create and start actions are done
+        server = self.client.servers.get_by_id(server.id)
+        logger.info(f"Server is {server.status} at {server.public_net.ipv4.ip}")
 
-            logger.debug(f"Server status: {server.status}")
-            time.sleep(10)
-
-        raise TimeoutError(f"Server did not become ready within {timeout} seconds")
+        # Ready once sshd accepts connections, rather than after a fixed delay
+        wait_for_port(server.public_net.ipv4.ip, 22, timeout=max(timeout - (time.time() - start_time), 0))
+        return server
 
     def _get_cloud_init_script(self) -> str:
         """Get the cloud-init script for server setup."""
         return """#cloud-config
 package_update: true
-package_upgrade: true
 
 packages:
   - git
@@ -90,6 +90,9 @@ class TestBenchmarkClasses:
         assert hasattr(suite, "time_linear_graph")
         assert hasattr(suite, "time_fan_out_graph")
         assert hasattr(suite, "time_fan_in_graph")
+        assert hasattr(suite, "time_fan_in_tree")
+        # fan_out_graph slices its precomputed output names by num_nodes
+        assert len(core._OUTPUT_NAMES) >= max(suite.params[0])
 
         # Check NodeOverheadSuite
         assert hasattr(core, "NodeOverheadSuite")
@@ -109,6 +112,26 @@ class TestBenchmarkClasses:
 
         assert hasattr(stats, "StatsScalingSuite")
 
+    def test_curve_data_list_fallback(self):
+        """Test that curve data falls back to (datetime, value) pairs when numpy curves are unsupported."""
+        from datetime import datetime
+        from unittest.mock import patch
+
+        import numpy as np
+
+        from csp_benchmarks.benchmarks import _curve_data
+
+        times = np.datetime64(datetime(2020, 1, 1), "s") + np.arange(3, dtype="timedelta64[s]")
+        rows = np.ones((3, 2))
+
+        with patch.object(_curve_data, "_numpy_curve_supported", return_value=False):
+            scalars = _curve_data.curve_data(float, times, np.arange(3.0))
+            arrays = _curve_data.curve_data(np.ndarray, times, rows)
+
+        assert scalars == [(datetime(2020, 1, 1, 0, 0, i), float(i)) for i in range(3)]
+        assert [t for t, _ in arrays] == [t for t, _ in scalars]
+        assert all(np.array_equal(row, np.ones(2)) for _, row in arrays)
+
 
 class TestASVConfig:
     """Test ASV configuration."""
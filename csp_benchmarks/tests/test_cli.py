@@ -1,23 +1,34 @@
 """Tests for the CLI module."""
 
+import gc
+import json
 from unittest.mock import patch
 
+from csp_benchmarks.cli import (
+    _discover_benchmarks,
+    _get_param_combinations,
+    _normalize_params,
+    discover_benchmarks,
+    format_ns,
+    format_time,
+    list_benchmarks,
+    main,
+    run_benchmark_method,
+    run_benchmarks,
+)
+
 
 class TestDiscoverBenchmarks:
     """Tests for benchmark discovery."""
 
     def test_discover_benchmarks_returns_dict(self):
         """Test that discover_benchmarks returns a dictionary."""
-        from csp_benchmarks.cli import discover_benchmarks
-
         result = discover_benchmarks()
         assert isinstance(result, dict)
         assert len(result) > 0
 
     def test_discover_benchmarks_has_expected_suites(self):
         """Test that known benchmark suites are discovered."""
-        from csp_benchmarks.cli import discover_benchmarks
-
         result = discover_benchmarks()
         suite_names = list(result.keys())
 
@@ -27,8 +38,6 @@ class TestDiscoverBenchmarks:
 
     def test_benchmark_info_structure(self):
         """Test that benchmark info has expected structure."""
-        from csp_benchmarks.cli import discover_benchmarks
-
         result = discover_benchmarks()
         for name, info in result.items():
             assert "class" in info
@@ -37,30 +46,58 @@ class TestDiscoverBenchmarks:
             assert isinstance(info["methods"], list)
             assert all(m.startswith("time_") for m in info["methods"])
 
+    def test_discover_benchmarks_is_cached(self):
+        """Test that repeated discovery does not import the modules again."""
+        discover_benchmarks()
+        with patch("csp_benchmarks.cli._safe_import") as mock_import:
+            discover_benchmarks()
+        mock_import.assert_not_called()
+
+    def test_discover_benchmarks_cache_clear(self):
+        """Test that clearing the cache forces a fresh discovery."""
+        first = _discover_benchmarks()
+        _discover_benchmarks.cache_clear()
+        second = _discover_benchmarks()
+        assert second is not first
+        assert second.keys() == first.keys()
+
+    def test_discover_benchmarks_returns_copy(self):
+        """Test that callers mutating the result do not corrupt the cache."""
+        result = discover_benchmarks()
+        name = next(iter(result))
+        result[name]["methods"].clear()
+        result.clear()
+
+        fresh = discover_benchmarks()
+        assert name in fresh
+        assert fresh[name]["methods"]
+
 
 class TestNormalizeParams:
     """Tests for parameter normalization."""
 
     def test_normalize_empty(self):
         """Test normalizing empty params."""
-        from csp_benchmarks.cli import _normalize_params
-
-        assert _normalize_params(None) == []
-        assert _normalize_params([]) == []
+        assert _normalize_params(None) == ()
+        assert _normalize_params([]) == ()
 
     def test_normalize_single_list(self):
         """Test normalizing a single parameter list."""
-        from csp_benchmarks.cli import _normalize_params
-
         result = _normalize_params([1, 2, 3])
-        assert result == [[1, 2, 3]]
+        assert result == ((1, 2, 3),)
 
     def test_normalize_multiple_lists(self):
         """Test normalizing multiple parameter lists."""
-        from csp_benchmarks.cli import _normalize_params
-
         result = _normalize_params([[1, 2], [3, 4]])
-        assert result == [[1, 2], [3, 4]]
+        assert result == ((1, 2), (3, 4))
+
+    def test_normalize_is_cached(self):
+        """Test that equal params share one normalized result."""
+        assert _normalize_params([[1, 2], [3, 4]]) is _normalize_params([[1, 2], [3, 4]])
+
+    def test_normalize_unhashable_values(self):
+        """Test that unhashable param values still normalize."""
+        assert _normalize_params([{"a": 1}, {"b": 2}]) == (({"a": 1}, {"b": 2}),)
 
 
 class TestGetParamCombinations:
@@ -68,70 +105,69 @@ class TestGetParamCombinations:
 
     def test_no_params(self):
         """Test with no parameters."""
-        from csp_benchmarks.cli import _get_param_combinations
-
-        result = _get_param_combinations(None, None)
+        result = list(_get_param_combinations(None, None))
         assert result == [{}]
 
     def test_single_param(self):
         """Test with single parameter."""
-        from csp_benchmarks.cli import _get_param_combinations
-
-        result = _get_param_combinations([1, 2, 3], ["x"])
+        result = list(_get_param_combinations([1, 2, 3], ["x"]))
         assert result == [{"x": 1}, {"x": 2}, {"x": 3}]
 
     def test_multiple_params(self):
         """Test with multiple parameters (product)."""
-        from csp_benchmarks.cli import _get_param_combinations
-
-        result = _get_param_combinations([[1, 2], [3, 4]], ["a", "b"])
+        result = list(_get_param_combinations([[1, 2], [3, 4]], ["a", "b"]))
         assert len(result) == 4
         assert {"a": 1, "b": 3} in result
         assert {"a": 2, "b": 4} in result
 
     def test_quick_mode(self):
         """Test quick mode reduces combinations."""
-        from csp_benchmarks.cli import _get_param_combinations
-
-        result = _get_param_combinations([1, 2, 3, 4, 5], ["x"], quick=True)
+        result = list(_get_param_combinations([1, 2, 3, 4, 5], ["x"], quick=True))
         assert result == [{"x": 1}, {"x": 5}]
 
+    def test_quick_mode_multiple_params(self):
+        """Test quick mode samples the first/last diagonal rather than the product."""
+        result = list(_get_param_combinations([[1, 2, 3], [4], [5, 6]], ["a", "b", "c"], quick=True))
+        assert result == [{"a": 1, "b": 4, "c": 5}, {"a": 3, "b": 4, "c": 6}]
+
+    def test_quick_mode_single_values(self):
+        """Test quick mode does not repeat a combination when every param has one value."""
+        result = list(_get_param_combinations([[1], [2]], ["a", "b"], quick=True))
+        assert result == [{"a": 1, "b": 2}]
+
 
 class TestFormatTime:
     """Tests for time formatting."""
 
     def test_nanoseconds(self):
         """Test formatting nanoseconds."""
-        from csp_benchmarks.cli import format_time
-
         assert "ns" in format_time(1e-9)
 
     def test_microseconds(self):
         """Test formatting microseconds."""
-        from csp_benchmarks.cli import format_time
-
         assert "µs" in format_time(1e-6)
 
     def test_milliseconds(self):
         """Test formatting milliseconds."""
-        from csp_benchmarks.cli import format_time
-
         assert "ms" in format_time(0.001)
 
     def test_seconds(self):
         """Test formatting seconds."""
-        from csp_benchmarks.cli import format_time
-
         assert "s" in format_time(1.5)
         assert "1.500" in format_time(1.5)
 
+    def test_format_ns(self):
+        """Test formatting integer nanoseconds."""
+        assert format_ns(500) == "500 ns"
+        assert format_ns(1_500) == "1.50 µs"
+        assert format_ns(2_000_000) == "2.00 ms"
+
 
 class TestRunBenchmarkMethod:
     """Tests for running individual benchmark methods."""
 
     def test_run_simple_benchmark(self):
         """Test running a simple benchmark."""
-        from csp_benchmarks.cli import run_benchmark_method
 
         class FakeBenchmark:
             def time_simple(self):
@@ -144,11 +180,11 @@ class TestRunBenchmarkMethod:
         assert "min" in result
         assert "max" in result
         assert "mean" in result
+        assert isinstance(result["mean_ns"], int)
         assert result["runs"] == 2
 
     def test_run_benchmark_with_params(self):
         """Test running benchmark with parameters."""
-        from csp_benchmarks.cli import run_benchmark_method
 
         class FakeBenchmark:
             def time_param(self, x, y):
@@ -159,9 +195,23 @@ class TestRunBenchmarkMethod:
 
         assert "error" not in result
 
+    def test_run_benchmark_without_warmup(self):
+        """Test that disabling warmup only performs the timed runs."""
+
+        class FakeBenchmark:
+            calls = 0
+
+            def time_count(self):
+                FakeBenchmark.calls += 1
+
+        instance = FakeBenchmark()
+        result = run_benchmark_method(instance, "time_count", {}, num_runs=2, warmup=False)
+
+        assert "error" not in result
+        assert FakeBenchmark.calls == 2
+
     def test_run_benchmark_with_error(self):
         """Test running benchmark that raises error."""
-        from csp_benchmarks.cli import run_benchmark_method
 
         class FakeBenchmark:
             def time_error(self):
@@ -173,14 +223,29 @@ class TestRunBenchmarkMethod:
         assert "error" in result
         assert "test error" in result["error"]
 
+    def test_run_benchmark_restores_gc(self):
+        """Test that the garbage collector is re-enabled even when a run fails."""
+
+        class FakeBenchmark:
+            calls = 0
+
+            def time_fail_second(self):
+                FakeBenchmark.calls += 1
+                if FakeBenchmark.calls > 1:
+                    raise ValueError("timed run failed")
+
+        assert gc.isenabled()
+        result = run_benchmark_method(FakeBenchmark(), "time_fail_second", {})
+
+        assert "error" in result
+        assert gc.isenabled()
+
 
 class TestListBenchmarks:
     """Tests for list_benchmarks function."""
 
     def test_list_benchmarks_returns_zero(self):
         """Test that list_benchmarks returns 0 on success."""
-        from csp_benchmarks.cli import list_benchmarks
-
         result = list_benchmarks()
         assert result == 0
 
@@ -190,28 +255,63 @@ class TestRunBenchmarks:
 
     def test_run_benchmarks_returns_int(self):
         """Test that run_benchmarks returns an integer."""
-        from csp_benchmarks.cli import run_benchmarks
-
         # Run with method filter that won't match to make test fast
         result = run_benchmarks(method_filter="nonexistent_method_xyz")
         assert isinstance(result, int)
 
+    def test_run_benchmarks_skips_not_implemented_setup(self, capsys):
+        """Test that a setup raising NotImplementedError is skipped, not failed."""
+
+        class SkippedSuite:
+            def setup(self):
+                raise NotImplementedError("optional dependency missing")
+
+            def time_anything(self):
+                pass
+
+        benchmarks = {"fake.SkippedSuite": {"class": SkippedSuite, "methods": ["time_anything"], "params": None, "param_names": None}}
+        with patch("csp_benchmarks.cli.discover_benchmarks", return_value=benchmarks):
+            result = run_benchmarks()
+
+        assert result == 0
+        assert "0 failed, 1 skipped" in capsys.readouterr().out
+
+    def test_run_benchmarks_json_output(self, capsys):
+        """Test that JSON mode writes only a JSON result list to stdout."""
+
+        class FakeSuite:
+            params = [1, 2]
+            param_names = ["n"]
+
+            def time_noop(self, n):
+                pass
+
+        benchmarks = {
+            "fake.FakeSuite": {"class": FakeSuite, "methods": ["time_noop"], "params": FakeSuite.params, "param_names": FakeSuite.param_names}
+        }
+        with patch("csp_benchmarks.cli.discover_benchmarks", return_value=benchmarks):
+            result = run_benchmarks(num_runs=1, json_output=True)
+
+        captured = capsys.readouterr()
+        assert result == 0
+        assert "Results: 2 passed" in captured.err
+        records = json.loads(captured.out)
+        assert [r["params"] for r in records] == [{"n": 1}, {"n": 2}]
+        assert all(r["suite"] == "fake.FakeSuite" and r["method"] == "time_noop" for r in records)
+        assert all(isinstance(r["mean_ns"], int) for r in records)
+
 
 class TestMainEntryPoint:
     """Tests for main CLI entry point."""
 
     def test_main_list(self):
         """Test main with list command."""
-        from csp_benchmarks.cli import main
-
         with patch("sys.argv", ["csp-benchmarks", "list"]):
             result = main()
             assert result == 0
 
     def test_main_run_quick(self):
         """Test main with run command in quick mode."""
-        from csp_benchmarks.cli import main
-
         # Use method filter to make test fast
         with patch("sys.argv", ["csp-benchmarks", "run", "-m", "nonexistent_xyz", "-q"]):
             result = main()
@@ -1,11 +1,16 @@
 """Tests for transform_results module."""
 
 import json
+import math
 from pathlib import Path
+from unittest.mock import patch
+
+import pytest
 
 from csp_benchmarks.transform_results import (
     CSP_VERSION_TO_COMMIT,
     extract_csp_version,
+    main,
     transform_all_results,
     transform_result_file,
 )
@@ -122,6 +127,14 @@ class TestTransformResultFile:
         assert data["env_name"] == "virtualenv-py3.12"
         assert "csp" not in data["env_name"]
 
+    def test_removes_mismatched_csp_from_env_name(self, tmp_path):
+        """Test that an env_name suffix for a different csp version is still stripped."""
+        src = self._create_test_result(tmp_path, "01ce9cfc-virtualenv-py3.12-csp0.13.0.json", "0.13.1")
+
+        new_path = transform_result_file(src, tmp_path)
+
+        assert json.loads(new_path.read_text())["env_name"] == "virtualenv-py3.12"
+
     def test_removes_csp_from_params(self, tmp_path):
         """Test that csp is removed from params dict."""
         src = self._create_test_result(tmp_path, "01ce9cfc-virtualenv-py3.12-csp0.13.0.json", "0.13.0")
@@ -147,6 +160,47 @@ class TestTransformResultFile:
 
         assert data["requirements"]["csp"] == "0.13.0"
 
+    def test_renames_without_rewriting_transformed_content(self, tmp_path):
+        """Test that a file whose content is already transformed is moved, not re-encoded."""
+        machine_dir = tmp_path / "test-machine"
+        machine_dir.mkdir()
+        src = machine_dir / "01ce9cfc-virtualenv-py3.12-csp0.13.0.json"
+        payload = {"commit_hash": CSP_VERSION_TO_COMMIT["0.13.0"], "env_name": "virtualenv-py3.12", "params": {"python": "3.12"}}
+        src.write_text(json.dumps(payload))
+
+        with patch("csp_benchmarks.transform_results._dump_json") as mock_dump:
+            new_path = transform_result_file(src, tmp_path)
+
+        mock_dump.assert_not_called()
+        assert not src.exists()
+        assert new_path.name == "0d92361f-virtualenv-py3.12.json"
+        assert new_path.read_text() == json.dumps(payload)
+
+    def test_prints_only_when_verbose(self, tmp_path, capsys):
+        """Test that per-file progress lines are opt-in."""
+        quiet = self._create_test_result(tmp_path, "01ce9cfc-virtualenv-py3.12-csp0.13.0.json", "0.13.0")
+        transform_result_file(quiet, tmp_path)
+        assert capsys.readouterr().out == ""
+
+        loud = self._create_test_result(tmp_path, "01ce9cfc-virtualenv-py3.12-csp0.14.0.json", "0.14.0")
+        transform_result_file(loud, tmp_path, verbose=True)
+        assert "Transformed: 01ce9cfc-virtualenv-py3.12-csp0.14.0.json" in capsys.readouterr().out
+
+    def test_failed_write_keeps_original(self, tmp_path):
+        """Test that an error while writing leaves the source file intact and no temp file behind."""
+        src = self._create_test_result(tmp_path, "01ce9cfc-virtualenv-py3.12-csp0.13.0.json", "0.13.0")
+        original = src.read_bytes()
+
+        def failing_dump(path, data, use_orjson):
+            path.write_text("{")
+            raise OSError("disk full")
+
+        with patch("csp_benchmarks.transform_results._dump_json", side_effect=failing_dump), pytest.raises(OSError):
+            transform_result_file(src, tmp_path)
+
+        assert src.read_bytes() == original
+        assert sorted(p.name for p in src.parent.iterdir()) == [src.name]
+
     def test_skips_machine_json(self, tmp_path):
         """Test that machine.json is skipped."""
         machine_dir = tmp_path / "test-machine"
@@ -180,6 +234,40 @@ class TestTransformResultFile:
 
         assert result is None
 
+    def test_skips_without_reading_file(self, tmp_path):
+        """Test that filename-based skips happen before the file is opened."""
+        # None of these exist, so any attempt to read them would raise
+        for filename in ["277a3200-virtualenv-py3.12.json", "machine.json", "01ce9cfc-virtualenv-py3.12-csp9.99.99.json"]:
+            assert transform_result_file(tmp_path / filename, tmp_path) is None
+
+    def test_stdlib_json_fallback(self, tmp_path):
+        """Test that transformation works without orjson installed."""
+        src = self._create_test_result(tmp_path, "01ce9cfc-virtualenv-py3.12-csp0.13.0.json", "0.13.0")
+
+        with patch("csp_benchmarks.transform_results.orjson", None):
+            new_path = transform_result_file(src, tmp_path)
+
+        text = new_path.read_text()
+        data = json.loads(text)
+        assert data["commit_hash"] == CSP_VERSION_TO_COMMIT["0.13.0"]
+        assert data["results"] == {"bench_test.time_test": [0.001, 0.002]}
+        assert text == json.dumps(data, indent=2)
+
+    def test_preserves_nan_results(self, tmp_path):
+        """Test that NaN results (asv's marker for skipped benchmarks) survive the transform."""
+        src = self._create_test_result(tmp_path, "01ce9cfc-virtualenv-py3.12-csp0.13.0.json", "0.13.0")
+        data = json.loads(src.read_text())
+        data["results"]["bench_test.time_skipped"] = [float("nan")]
+        src.write_text(json.dumps(data))
+
+        new_path = transform_result_file(src, tmp_path)
+
+        text = new_path.read_text()
+        assert "NaN" in text
+        result = json.loads(text)
+        assert result["commit_hash"] == CSP_VERSION_TO_COMMIT["0.13.0"]
+        assert math.isnan(result["results"]["bench_test.time_skipped"][0])
+
     def test_all_known_versions(self, tmp_path):
         """Test transformation works for all known CSP versions."""
         for version, expected_commit in CSP_VERSION_TO_COMMIT.items():
@@ -239,6 +327,39 @@ class TestTransformAllResults:
 
         assert count == 3
 
+    def test_transforms_in_process_pool(self, tmp_path):
+        """Test that the process-pool path gives the same results as the serial one."""
+        machine_dir = tmp_path / "test-machine"
+        machine_dir.mkdir()
+
+        for python in ["3.11", "3.12", "3.13"]:
+            for version in CSP_VERSION_TO_COMMIT:
+                self._create_result_file(machine_dir, f"01ce9cfc-virtualenv-py{python}-csp{version}.json", version)
+
+        with patch("csp_benchmarks.transform_results._PARALLEL_MIN_FILES", 0):
+            count = transform_all_results(tmp_path, max_workers=2)
+
+        assert count == 15
+        assert len(list(machine_dir.glob("*-csp*.json"))) == 0
+        assert (machine_dir / "0d92361f-virtualenv-py3.13.json").exists()
+
+    def test_process_pool_output_grouped_by_machine(self, tmp_path, capfd):
+        """Test that verbose worker output appears under its own machine's header."""
+        for machine in ["machine-a", "machine-b"]:
+            machine_dir = tmp_path / machine
+            machine_dir.mkdir()
+            for version in CSP_VERSION_TO_COMMIT:
+                self._create_result_file(machine_dir, f"01ce9cfc-virtualenv-py3.12-csp{version}.json", version)
+
+        with patch("csp_benchmarks.transform_results._PARALLEL_MIN_FILES", 0):
+            assert transform_all_results(tmp_path, max_workers=2, verbose=True) == 10
+
+        lines = capfd.readouterr().out.splitlines()
+        headers = [i for i, line in enumerate(lines) if line.startswith("Processing machine:")]
+        assert len(headers) == 2
+        assert len([line for line in lines[headers[0] : headers[1]] if "Transformed:" in line]) == 5
+        assert len([line for line in lines[headers[1] :] if "Transformed:" in line]) == 5
+
     def test_preserves_machine_json(self, tmp_path):
         """Test that machine.json files are preserved."""
         machine_dir = tmp_path / "test-machine"
@@ -289,3 +410,10 @@ class TestTransformAllResults:
         with open(transformed) as f:
             data = json.load(f)
         assert data["commit_hash"] == CSP_VERSION_TO_COMMIT["0.13.0"]
+
+    @pytest.mark.parametrize("jobs", ["0", "-2", "many"])
+    def test_main_rejects_invalid_jobs(self, tmp_path, jobs):
+        """Test that --jobs must be a positive integer."""
+        with patch("sys.argv", ["transform_results", "--results-dir", str(tmp_path), "--jobs", jobs]), pytest.raises(SystemExit) as exc_info:
+            main()
+        assert exc_info.value.code == 2
@@ -7,26 +7,82 @@ rather than separate series with vertical dots.
 """
 
 import json
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
 from pathlib import Path
 
-# Real commit hashes from CSP repo tags (git rev-parse v0.X.Y^{commit})
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
+# Real commit hashes from CSP repo tags (git rev-parse v0.X.Y^{commit}).
+# Versions are interned so lookups with the (also interned) extracted version hit on identity
 CSP_VERSION_TO_COMMIT = {
-    "0.12.0": "277a3200c601c4c2982b871cfea8ba9085e8640b",
-    "0.13.0": "0d92361fcbb127f64a9fda2ed9f490c2d5c2dfd9",
-    "0.13.1": "b20dff2379f7731218dff32cdcc02a1d3e0c3190",
-    "0.13.2": "bb04478d344396e4dc3fee664bfb1537aa3b0e20",
-    "0.14.0": "952de074ddda926bf4a881b5f13423d2a8373aad",
+    sys.intern(version): commit
+    for version, commit in (
+        ("0.12.0", "277a3200c601c4c2982b871cfea8ba9085e8640b"),
+        ("0.13.0", "0d92361fcbb127f64a9fda2ed9f490c2d5c2dfd9"),
+        ("0.13.1", "b20dff2379f7731218dff32cdcc02a1d3e0c3190"),
+        ("0.13.2", "bb04478d344396e4dc3fee664bfb1537aa3b0e20"),
+        ("0.14.0", "952de074ddda926bf4a881b5f13423d2a8373aad"),
+    )
 }
 
+# Short hashes used as result filename prefixes, sliced once rather than per file
+_VERSION_TO_SHORT = {version: sys.intern(commit[:8]) for version, commit in CSP_VERSION_TO_COMMIT.items()}
+
+# Compiled once; these run for every file in the results directory
+_CSP_VER_RE = re.compile(r"-csp(\d+\.\d+\.\d+)\.json$")
+_ENV_SUFFIX_RE = re.compile(r"-csp\d+\.\d+\.\d+$")
+
+# Shared stdlib encoder for the non-orjson path; data comes straight from json.loads,
+# so the per-call circular-reference bookkeeping can be skipped
+_JSON_ENCODER = json.JSONEncoder(indent=2, check_circular=False)
+
+# Below this many candidate files, worker start-up costs more than it saves
+_PARALLEL_MIN_FILES = 32
+
+
+def _load_json(path: Path) -> tuple[dict, bool]:
+    """
+    Read a JSON file, with orjson when available.
 
+    asv records skipped benchmarks as ``NaN``, which orjson rejects, so such files
+    are parsed with the stdlib instead. The returned flag is True only when orjson
+    parsed the file, i.e. it holds no non-finite floats and orjson can write it back.
+    """
+    raw = path.read_bytes()
+    if orjson is not None:
+        try:
+            return orjson.loads(raw), True
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(raw), False
+
+
+def _dump_json(path: Path, data: dict, use_orjson: bool) -> None:
+    """Write a JSON file indented by 2 spaces, with orjson if ``use_orjson`` (orjson would turn NaN into null)."""
+    if use_orjson:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        # One encode() call builds the document in C instead of json.dump's many small writes
+        path.write_text(_JSON_ENCODER.encode(data))
+
+
+@lru_cache(maxsize=4096)
 def extract_csp_version(filename: str) -> str | None:
     """Extract CSP version from filename like '01ce9cfc-virtualenv-py3.12-csp0.13.0.json'."""
-    match = re.search(r"-csp(\d+\.\d+\.\d+)\.json$", filename)
-    return match.group(1) if match else None
+    # Cached: the same filename recurs under every machine directory
+    match = _CSP_VER_RE.search(filename)
+    return sys.intern(match.group(1)) if match else None
 
 
-def transform_result_file(src_path: Path, results_dir: Path) -> Path | None:
+def transform_result_file(src_path: Path, results_dir: Path, verbose: bool = False) -> Path | None:
     """
     Transform a single result file:
     1. Use real CSP commit hash in filename
@@ -34,10 +90,15 @@ def transform_result_file(src_path: Path, results_dir: Path) -> Path | None:
     3. Remove csp from params
     4. Keep requirements for install but ASV won't use it for series grouping
 
+    Per-file progress is only printed when ``verbose`` is set.
+
     Returns the new path, or None if transformation was skipped.
     """
     filename = src_path.name
 
+    # All skip checks below look only at the filename, so skipped files (including
+    # already-transformed ones on a rerun) are never opened or parsed
+
     # Skip non-result files
     if filename == "machine.json" or not filename.endswith(".json"):
         return None
@@ -45,80 +106,131 @@ def transform_result_file(src_path: Path, results_dir: Path) -> Path | None:
     # Extract CSP version
     csp_version = extract_csp_version(filename)
     if not csp_version:
-        print(f"  Skipping {filename}: no CSP version found")
+        if verbose:
+            print(f"  Skipping {filename}: no CSP version found", flush=True)
         return None
 
     # Get real commit hash
     real_commit = CSP_VERSION_TO_COMMIT.get(csp_version)
     if not real_commit:
-        print(f"  Skipping {filename}: unknown CSP version {csp_version}")
+        if verbose:
+            print(f"  Skipping {filename}: unknown CSP version {csp_version}", flush=True)
         return None
 
-    real_commit_short = real_commit[:8]
+    real_commit_short = _VERSION_TO_SHORT[csp_version]
 
     # Build new filename - remove csp from env name
     # Old: 01ce9cfc-virtualenv-py3.12-csp0.13.0.json
     # New: 0d92361f-virtualenv-py3.12.json
-    new_filename = re.sub(r"^[a-f0-9]{8}", real_commit_short, filename)
-    new_filename = re.sub(r"-csp\d+\.\d+\.\d+\.json$", ".json", new_filename)
+    # The version suffix is known from extract_csp_version, so plain slicing suffices
+    new_filename = filename[: -len(f"-csp{csp_version}.json")] + ".json"
+    if len(new_filename) >= 8 and not new_filename[:8].strip("0123456789abcdef"):
+        new_filename = real_commit_short + new_filename[8:]
 
     new_path = src_path.parent / new_filename
 
     # Read and update JSON content
-    with open(src_path) as f:
-        data = json.load(f)
-
-    # Update commit_hash
-    data["commit_hash"] = real_commit
-
-    # Update env_name - remove csp part
-    old_env = data.get("env_name", "")
-    data["env_name"] = re.sub(r"-csp\d+\.\d+\.\d+$", "", old_env)
-
-    # Remove csp from params (so ASV doesn't create separate series)
-    if "params" in data and "csp" in data["params"]:
-        del data["params"]["csp"]
-
-    # Write to new file
-    with open(new_path, "w") as f:
-        json.dump(data, f, indent=2)
+    data, use_orjson = _load_json(src_path)
+
+    old_env = data.get("env_name")
+    new_env = old_env or ""
+    # The suffix normally matches the filename's version, so a plain slice avoids the regex
+    env_suffix = f"-csp{csp_version}"
+    if new_env.endswith(env_suffix):
+        new_env = new_env[: -len(env_suffix)]
+    elif "-csp" in new_env:
+        new_env = _ENV_SUFFIX_RE.sub("", new_env)
+    # If content is already transformed, only the name needs fixing, so skip re-encoding it
+    if data.get("commit_hash") != real_commit or old_env != new_env or "csp" in data.get("params", {}):
+        # Update commit_hash
+        data["commit_hash"] = real_commit
+
+        # Update env_name - remove csp part
+        data["env_name"] = new_env
+
+        # Remove csp from params (so ASV doesn't create separate series)
+        if "params" in data and "csp" in data["params"]:
+            del data["params"]["csp"]
+
+        # Write beside the target and move it into place, so a failed write never leaves a
+        # truncated original or target behind
+        tmp_path = new_path.with_name(new_path.name + ".tmp")
+        try:
+            _dump_json(tmp_path, data, use_orjson)
+            os.replace(tmp_path, new_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        # Remove old file if different
+        if src_path != new_path:
+            src_path.unlink()
+    elif src_path != new_path:
+        src_path.replace(new_path)
+
+    if verbose:
+        print(f"  Transformed: {filename} -> {new_filename}", flush=True)
+    return new_path
 
-    # Remove old file if different
-    if src_path != new_path:
-        src_path.unlink()
 
-    print(f"  Transformed: {filename} -> {new_filename}")
-    return new_path
+def transform_all_results(results_dir: Path, max_workers: int | None = None, verbose: bool = False) -> int:
+    """
+    Transform all result files in the results directory.
 
+    Files are independent, so large result trees are transformed in a process
+    pool of ``max_workers`` processes (default: one per CPU); pass 1 to stay serial.
+    Machines are processed one after another, so output stays grouped under each
+    machine's line; per-file lines are only printed when ``verbose`` is set.
+    """
+    machines = []
 
-def transform_all_results(results_dir: Path) -> int:
-    """Transform all result files in the results directory."""
-    transformed_count = 0
+    # scandir reuses the directory entry's type info and avoids glob matching;
+    # Paths are only built for the files handed to transform_result_file
+    with os.scandir(results_dir) as machine_entries:
+        for machine_entry in machine_entries:
+            if not machine_entry.is_dir():
+                continue
 
-    for machine_dir in results_dir.iterdir():
-        if not machine_dir.is_dir():
-            continue
+            with os.scandir(machine_entry.path) as file_entries:
+                result_files = [
+                    Path(file_entry.path) for file_entry in file_entries if file_entry.name.endswith(".json") and file_entry.name != "machine.json"
+                ]
+            machines.append((machine_entry.name, result_files))
 
-        print(f"Processing machine: {machine_dir.name}")
+    count = 0
+    use_pool = max_workers != 1 and sum(len(result_files) for _, result_files in machines) >= _PARALLEL_MIN_FILES
+    with ProcessPoolExecutor(max_workers=max_workers) if use_pool else nullcontext() as executor:
+        for machine_name, result_files in machines:
+            print(f"Processing machine: {machine_name}", flush=True)
 
-        for result_file in list(machine_dir.glob("*.json")):
-            if result_file.name == "machine.json":
-                continue
+            results_dirs = [results_dir] * len(result_files)
+            verbose_flags = [verbose] * len(result_files)
+            if executor is None:
+                new_paths = map(transform_result_file, result_files, results_dirs, verbose_flags)
+            else:
+                # Collected before the next machine's line is printed, keeping worker output under this header
+                new_paths = list(executor.map(transform_result_file, result_files, results_dirs, verbose_flags, chunksize=16))
 
-            new_path = transform_result_file(result_file, results_dir)
-            if new_path and new_path != result_file:
-                transformed_count += 1
+            count += sum(1 for result_file, new_path in zip(result_files, new_paths) if new_path and new_path != result_file)
 
-    return transformed_count
+    return count
 
 
 def main():
     """Main entry point."""
     import argparse
 
+    def positive_int(value: str) -> int:
+        jobs = int(value)
+        if jobs < 1:
+            raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+        return jobs
+
     parser = argparse.ArgumentParser(description="Transform ASV results to use real CSP commit hashes")
     parser.add_argument("--results-dir", type=Path, default=Path("csp_benchmarks/results"), help="Path to results directory")
     parser.add_argument("--dry-run", action="store_true", help="Don't actually modify files")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Print a line for every transformed or skipped file")
+    parser.add_argument("--jobs", "-j", type=positive_int, default=None, help="Worker processes for large result trees (default: one per CPU)")
 
     args = parser.parse_args()
 
@@ -134,7 +246,7 @@ def main():
         print("DRY RUN - no files will be modified")
         print()
 
-    count = transform_all_results(args.results_dir)
+    count = transform_all_results(args.results_dir, max_workers=args.jobs, verbose=args.verbose)
     print(f"\nTransformed {count} files")
     return 0
 